@@ -105,6 +105,10 @@ impl FileContent {
             is_binary,
         }
     }
+
+    pub fn size(&self) -> u64 {
+        self.size
+    }
 }
 
 #[derive(Deserialize)]
@@ -19,7 +19,9 @@ pub mod update;
 pub mod ws;
 
 use axum::{
-    Router, middleware,
+    Router,
+    extract::DefaultBodyLimit,
+    middleware,
     routing::{any, delete, get, post, put},
 };
 use config::Config;
@@ -182,8 +184,12 @@ pub fn create_app_with_secret(
         .route("/api/sftp/rename", post(sftp::api::rename))
         .route("/api/sftp/delete", delete(sftp::api::delete))
         .route("/api/sftp/download", get(sftp::api::download))
-        .route("/api/sftp/upload", post(sftp::api::upload))
+        .route(
+            "/api/sftp/upload",
+            post(sftp::api::upload).layer(DefaultBodyLimit::max(sftp::api::UPLOAD_BODY_LIMIT)),
+        )
         .route("/api/sftp/search", get(sftp::api::search))
+        .route("/api/sftp/batch", post(sftp::api::batch))
         // System update API
         .route("/api/system/version", get(update::get_version))
         .route("/api/system/update", post(update::do_update))
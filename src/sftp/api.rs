@@ -4,10 +4,13 @@ use axum::{
     http::{StatusCode, header},
     response::IntoResponse,
 };
+use futures::future::try_join_all;
 use russh_sftp::client::SftpSession;
+use russh_sftp::protocol::OpenFlags;
 use serde::{Deserialize, Serialize};
 use std::collections::HashMap;
 use std::sync::Arc;
+use tokio::io::{AsyncRead, AsyncReadExt, AsyncSeekExt, AsyncWriteExt};
 
 use crate::AppState;
 use crate::filer::api::{
@@ -26,12 +29,25 @@ type ApiError = (StatusCode, Json<ErrorResponse>);
 const MAX_READ_SIZE: u64 = 10 * 1024 * 1024;
 /// アップロード上限: 50MB
 const MAX_UPLOAD_SIZE: usize = 50 * 1024 * 1024;
+/// upload のリクエストボディ上限。axum 既定の 2MB では MAX_UPLOAD_SIZE に届かないため、
+/// ファイル本体 + multipart ヘッダー・path フィールド分の余裕を許可する
+pub const UPLOAD_BODY_LIMIT: usize = MAX_UPLOAD_SIZE + 1024 * 1024;
 /// ダウンロード上限: 100MB
 const MAX_DOWNLOAD_SIZE: u64 = 100 * 1024 * 1024;
 /// 検索深さ上限
 const MAX_SEARCH_DEPTH: u32 = 10;
 /// 検索結果上限
 const MAX_SEARCH_RESULTS: usize = 100;
+/// バッチ操作数上限
+const MAX_BATCH_OPS: usize = 100;
+/// バッチ内 read の合計上限（単体 read と同じ。レスポンス JSON に全内容が載るため）
+const MAX_BATCH_READ_SIZE: u64 = MAX_READ_SIZE;
+/// 並行転送の区間長をこの倍数に揃える。これ以下のデータは区間分割せず単一ハンドルで転送する。
+/// SSH_FXP_WRITE 1 回あたりの長さではない（それは write_all がサーバーの上限に合わせて決める）
+const SFTP_SEGMENT_ALIGN: usize = 128 * 1024;
+/// download/upload で並行に張るファイルハンドル数。各ハンドルは READ/WRITE を 1 つずつ
+/// 順に発行するので、これが同時に飛ぶリクエスト数の上限になる（既定の窓 16 に合わせる）
+const SFTP_PIPELINE_DEPTH: usize = 16;
 
 // --- リクエスト型 ---
 
@@ -45,6 +61,55 @@ pub struct ConnectRequest {
     pub key_path: Option<String>,
 }
 
+/// バッチの 1 操作。`{"op": "write", "path": ..., "content": ...}` の形式
+#[derive(Deserialize)]
+#[serde(tag = "op", rename_all = "lowercase")]
+pub enum BatchOp {
+    Read { path: String },
+    Write { path: String, content: String },
+    Mkdir { path: String },
+    Rename { from: String, to: String },
+    Delete { path: String },
+}
+
+#[derive(Deserialize)]
+pub struct BatchRequest {
+    pub ops: Vec<BatchOp>,
+}
+
+/// 操作ごとの結果。`status` は個別 API と同じ HTTP ステータス、
+/// 失敗時は `error`、read 成功時は FileContent のフィールドを含む
+#[derive(Serialize)]
+pub struct BatchResult {
+    status: u16,
+    #[serde(flatten)]
+    error: Option<ErrorResponse>,
+    #[serde(flatten)]
+    file: Option<FileContent>,
+}
+
+impl From<Result<(StatusCode, Option<FileContent>), ApiError>> for BatchResult {
+    fn from(result: Result<(StatusCode, Option<FileContent>), ApiError>) -> Self {
+        match result {
+            Ok((status, file)) => BatchResult {
+                status: status.as_u16(),
+                error: None,
+                file,
+            },
+            Err((status, Json(error))) => BatchResult {
+                status: status.as_u16(),
+                error: Some(error),
+                file: None,
+            },
+        }
+    }
+}
+
+#[derive(Serialize)]
+pub struct BatchResponse {
+    pub results: Vec<BatchResult>,
+}
+
 #[derive(Serialize)]
 pub struct StatusResponse {
     pub connected: bool,
@@ -75,6 +140,12 @@ fn sftp_err(e: SftpError) -> ApiError {
     }
 }
 
+/// リモートファイルハンドル経由の I/O 失敗（SFTP ステータスが io::Error に包まれる）を
+/// sftp.read / sftp.write と同じ 502 "SFTP error" として返す
+fn sftp_io_err(e: std::io::Error) -> ApiError {
+    err(StatusCode::BAD_GATEWAY, &format!("SFTP error: {e}"))
+}
+
 /// パス検証: null バイト拒否、空パス拒否
 fn validate_path(raw: &str) -> Result<String, ApiError> {
     if raw.is_empty() {
@@ -315,41 +386,7 @@ pub async fn read(
 ) -> Result<Json<FileContent>, ApiError> {
     let path = validate_path(&q.path)?;
     let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
-    let sftp = guard.sftp();
-
-    let meta = sftp
-        .metadata(&path)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
-    if meta.is_dir() {
-        return Err(err(StatusCode::NOT_FOUND, "Not a file"));
-    }
-    let size = meta.size.unwrap_or(0);
-    if size > MAX_READ_SIZE {
-        return Err(err(
-            StatusCode::PAYLOAD_TOO_LARGE,
-            &format!("File too large: {} bytes (max {})", size, MAX_READ_SIZE),
-        ));
-    }
-
-    let data = sftp
-        .read(&path)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
-    let binary = is_binary(&data);
-
-    let content = if binary {
-        String::new()
-    } else {
-        String::from_utf8_lossy(&data).into_owned()
-    };
-
-    Ok(Json(FileContent::new(
-        path,
-        content,
-        data.len() as u64,
-        binary,
-    )))
+    read_file(guard.sftp(), path, MAX_READ_SIZE).await.map(Json)
 }
 
 /// PUT /api/sftp/write
@@ -359,12 +396,7 @@ pub async fn write(
 ) -> Result<StatusCode, ApiError> {
     let path = validate_path(&req.path)?;
     let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
-    let sftp = guard.sftp();
-
-    tracing::info!("sftp: write {}", path);
-    sftp.write(&path, req.content.as_bytes())
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    write_file(guard.sftp(), &path, &req.content).await?;
     Ok(StatusCode::OK)
 }
 
@@ -375,12 +407,7 @@ pub async fn mkdir(
 ) -> Result<StatusCode, ApiError> {
     let path = validate_path(&req.path)?;
     let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
-    let sftp = guard.sftp();
-
-    tracing::info!("sftp: mkdir {}", path);
-    sftp.create_dir(&path)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    make_dir(guard.sftp(), &path).await?;
     Ok(StatusCode::CREATED)
 }
 
@@ -392,12 +419,7 @@ pub async fn rename(
     let from = validate_path(&req.from)?;
     let to = validate_path(&req.to)?;
     let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
-    let sftp = guard.sftp();
-
-    tracing::info!("sftp: rename {} -> {}", from, to);
-    sftp.rename(&from, &to)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    rename_path(guard.sftp(), &from, &to).await?;
     Ok(StatusCode::OK)
 }
 
@@ -408,21 +430,275 @@ pub async fn delete(
 ) -> Result<StatusCode, ApiError> {
     let path = validate_path(&q.path)?;
     let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
+    delete_path(guard.sftp(), &path).await?;
+    Ok(StatusCode::OK)
+}
+
+/// POST /api/sftp/batch
+///
+/// 複数のファイル操作を 1 リクエスト・1 ガード取得で順に実行する（RTT 削減）。
+/// 最初に失敗した操作で中断し、そこまでの結果を返す。
+pub async fn batch(
+    State(state): State<Arc<AppState>>,
+    Json(req): Json<BatchRequest>,
+) -> Result<Json<BatchResponse>, ApiError> {
+    if req.ops.len() > MAX_BATCH_OPS {
+        return Err(err(
+            StatusCode::PAYLOAD_TOO_LARGE,
+            &format!(
+                "Too many operations: {} (max {})",
+                req.ops.len(),
+                MAX_BATCH_OPS
+            ),
+        ));
+    }
+    let guard = state.sftp_manager.get().await.map_err(sftp_err)?;
     let sftp = guard.sftp();
 
-    tracing::info!("sftp: delete {}", path);
+    let mut results = Vec::with_capacity(req.ops.len());
+    let mut read_total: u64 = 0;
+    for op in req.ops {
+        let result = run_batch_op(sftp, op, MAX_BATCH_READ_SIZE - read_total).await;
+        if let Ok((_, Some(file))) = &result {
+            read_total += file.size();
+        }
+        let failed = result.is_err();
+        results.push(BatchResult::from(result));
+        if failed {
+            break;
+        }
+    }
+    Ok(Json(BatchResponse { results }))
+}
+
+/// read_budget: バッチ内でまだ読める合計バイト数。超える read は 413 で止まる
+async fn run_batch_op(
+    sftp: &SftpSession,
+    op: BatchOp,
+    read_budget: u64,
+) -> Result<(StatusCode, Option<FileContent>), ApiError> {
+    match op {
+        BatchOp::Read { path } => {
+            let path = validate_path(&path)?;
+            let file = read_file(sftp, path, read_budget).await?;
+            Ok((StatusCode::OK, Some(file)))
+        }
+        BatchOp::Write { path, content } => {
+            write_file(sftp, &validate_path(&path)?, &content).await?;
+            Ok((StatusCode::OK, None))
+        }
+        BatchOp::Mkdir { path } => {
+            make_dir(sftp, &validate_path(&path)?).await?;
+            Ok((StatusCode::CREATED, None))
+        }
+        BatchOp::Rename { from, to } => {
+            rename_path(sftp, &validate_path(&from)?, &validate_path(&to)?).await?;
+            Ok((StatusCode::OK, None))
+        }
+        BatchOp::Delete { path } => {
+            delete_path(sftp, &validate_path(&path)?).await?;
+            Ok((StatusCode::OK, None))
+        }
+    }
+}
+
+// --- 単一操作（個別ハンドラと batch で共有） ---
+
+/// max バイトを超えるファイルは 413（stat 後に伸びた場合も読み込み後に判定）
+async fn read_file(sftp: &SftpSession, path: String, max: u64) -> Result<FileContent, ApiError> {
     let meta = sftp
         .metadata(&path)
         .await
         .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
     if meta.is_dir() {
-        remove_dir_recursive(sftp, &path).await.map_err(sftp_err)?;
+        return Err(err(StatusCode::NOT_FOUND, "Not a file"));
+    }
+    let size = meta.size.unwrap_or(0);
+    if size > max {
+        return Err(read_too_large(size, max));
+    }
+
+    let data = sftp
+        .read(&path)
+        .await
+        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    if data.len() as u64 > max {
+        return Err(read_too_large(data.len() as u64, max));
+    }
+    let binary = is_binary(&data);
+
+    let content = if binary {
+        String::new()
     } else {
-        sftp.remove_file(&path)
+        String::from_utf8_lossy(&data).into_owned()
+    };
+
+    Ok(FileContent::new(path, content, data.len() as u64, binary))
+}
+
+fn read_too_large(size: u64, max: u64) -> ApiError {
+    err(
+        StatusCode::PAYLOAD_TOO_LARGE,
+        &format!("File too large: {} bytes (max {})", size, max),
+    )
+}
+
+async fn write_file(sftp: &SftpSession, path: &str, content: &str) -> Result<(), ApiError> {
+    tracing::info!("sftp: write {}", path);
+    create_and_write(sftp, path, content.as_bytes()).await
+}
+
+/// 1 ハンドルで書き込む（作成 or 切り詰め）。
+/// SSH_FXP_WRITE への分割は write_all がサーバーの書き込み上限に合わせて行う
+async fn create_and_write(sftp: &SftpSession, path: &str, data: &[u8]) -> Result<(), ApiError> {
+    let mut file = sftp
+        .create(path)
+        .await
+        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    file.write_all(data).await.map_err(sftp_io_err)?;
+    file.shutdown().await.map_err(sftp_io_err)?;
+    Ok(())
+}
+
+/// 大きなデータを SFTP_PIPELINE_DEPTH 区間に分け、区間ごとに別ハンドルで並行に書き込む。
+/// russh-sftp は 1 セッション上でリクエストを多重化するので、ACK 待ちが区間ごとに独立する。
+async fn write_pipelined(sftp: &SftpSession, path: &str, data: &[u8]) -> Result<(), ApiError> {
+    if data.len() <= SFTP_SEGMENT_ALIGN {
+        return create_and_write(sftp, path, data).await;
+    }
+    // 作成 + 切り詰めを先に済ませ、各区間は WRITE のみで開く
+    create_and_write(sftp, path, &[]).await?;
+
+    let segment = pipeline_segment_len(data.len());
+    try_join_all(
+        data.chunks(segment)
+            .enumerate()
+            .map(|(i, part)| async move {
+                let mut file = sftp
+                    .open_with_flags(path, OpenFlags::WRITE)
+                    .await
+                    .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+                file.seek(std::io::SeekFrom::Start((i * segment) as u64))
+                    .await
+                    .map_err(sftp_io_err)?;
+                file.write_all(part).await.map_err(sftp_io_err)?;
+                file.shutdown().await.map_err(sftp_io_err)?;
+                Ok::<_, ApiError>(())
+            }),
+    )
+    .await?;
+    Ok(())
+}
+
+/// stat 済みのファイルを SFTP_PIPELINE_DEPTH 区間に分けて並行に読み込む。
+/// stat 後にサイズが変わっても sftp.read と同じく EOF までの内容を返す
+async fn read_pipelined(sftp: &SftpSession, path: &str, size: usize) -> Result<Vec<u8>, ApiError> {
+    if size <= SFTP_SEGMENT_ALIGN {
+        return sftp
+            .read(path)
             .await
-            .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+            .map_err(|e| sftp_err(SftpError::Sftp(e)));
+    }
+
+    let mut data = vec![0u8; size];
+    let segment = pipeline_segment_len(size);
+    let last = size.div_ceil(segment) - 1;
+    let results = try_join_all(
+        data.chunks_mut(segment)
+            .enumerate()
+            .map(|(i, part)| async move {
+                let mut file = sftp
+                    .open(path)
+                    .await
+                    .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+                file.seek(std::io::SeekFrom::Start((i * segment) as u64))
+                    .await
+                    .map_err(sftp_io_err)?;
+                let filled = read_up_to(&mut file, part).await.map_err(sftp_io_err)?;
+                // stat 後に伸びた分は最後の区間が EOF まで読み足す
+                let mut grown = Vec::new();
+                if i == last && filled == part.len() {
+                    file.read_to_end(&mut grown).await.map_err(sftp_io_err)?;
+                }
+                file.shutdown().await.map_err(sftp_io_err)?;
+                Ok::<_, ApiError>((filled, part.len(), grown))
+            }),
+    )
+    .await?;
+
+    let filled: Vec<(usize, usize)> = results.iter().map(|(n, want, _)| (*n, *want)).collect();
+    match shrunk_len(segment, &filled) {
+        Some(len) => data.truncate(len),
+        None => {
+            if let Some((_, _, grown)) = results.last() {
+                data.extend_from_slice(grown);
+            }
+        }
+    }
+    Ok(data)
+}
+
+/// buf が埋まるか EOF に当たるまで読み、読めたバイト数を返す
+async fn read_up_to<R: AsyncRead + Unpin>(
+    reader: &mut R,
+    buf: &mut [u8],
+) -> std::io::Result<usize> {
+    let mut filled = 0;
+    while filled < buf.len() {
+        let n = reader.read(&mut buf[filled..]).await?;
+        if n == 0 {
+            break;
+        }
+        filled += n;
+    }
+    Ok(filled)
+}
+
+/// 区間ごとの (読めた長さ, 区間長) から、stat 後に縮んだファイルの実際の長さを求める。
+/// どの区間も埋まっていれば None
+fn shrunk_len(segment: usize, filled: &[(usize, usize)]) -> Option<usize> {
+    filled
+        .iter()
+        .enumerate()
+        .filter(|(_, (n, want))| n < want)
+        .map(|(i, (n, _))| i * segment + n)
+        .min()
+}
+
+/// 区間長: SFTP_SEGMENT_ALIGN の倍数に切り上げ、区間数が SFTP_PIPELINE_DEPTH を超えないようにする
+fn pipeline_segment_len(total: usize) -> usize {
+    total
+        .div_ceil(SFTP_PIPELINE_DEPTH)
+        .next_multiple_of(SFTP_SEGMENT_ALIGN)
+}
+
+async fn make_dir(sftp: &SftpSession, path: &str) -> Result<(), ApiError> {
+    tracing::info!("sftp: mkdir {}", path);
+    sftp.create_dir(path)
+        .await
+        .map_err(|e| sftp_err(SftpError::Sftp(e)))
+}
+
+async fn rename_path(sftp: &SftpSession, from: &str, to: &str) -> Result<(), ApiError> {
+    tracing::info!("sftp: rename {} -> {}", from, to);
+    sftp.rename(from, to)
+        .await
+        .map_err(|e| sftp_err(SftpError::Sftp(e)))
+}
+
+async fn delete_path(sftp: &SftpSession, path: &str) -> Result<(), ApiError> {
+    tracing::info!("sftp: delete {}", path);
+    let meta = sftp
+        .metadata(path)
+        .await
+        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    if meta.is_dir() {
+        remove_dir_recursive(sftp, path).await.map_err(sftp_err)
+    } else {
+        sftp.remove_file(path)
+            .await
+            .map_err(|e| sftp_err(SftpError::Sftp(e)))
     }
-    Ok(StatusCode::OK)
 }
 
 /// SFTP に rm -rf がないため再帰削除
@@ -468,10 +744,7 @@ pub async fn download(
         ));
     }
 
-    let data = sftp
-        .read(&path)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    let data = read_pipelined(sftp, &path, size as usize).await?;
 
     let file_name = path.rsplit('/').next().unwrap_or("download").to_string();
     let safe_name: String = file_name
@@ -570,9 +843,7 @@ pub async fn upload(
     let dest = format!("{}/{}", resolved_dir, file_name);
 
     tracing::info!("sftp: upload {} ({} bytes)", dest, data.len());
-    sftp.write(&dest, &data)
-        .await
-        .map_err(|e| sftp_err(SftpError::Sftp(e)))?;
+    write_pipelined(sftp, &dest, &data).await?;
     Ok(StatusCode::CREATED)
 }
 
@@ -808,3 +1079,53 @@ pub async fn remove_known_host(
 
     Ok(StatusCode::OK)
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn pipeline_segment_len_is_aligned() {
+        let total = 10 * 1024 * 1024 + 1;
+        let segment = pipeline_segment_len(total);
+        assert_eq!(segment % SFTP_SEGMENT_ALIGN, 0);
+        assert!(total.div_ceil(segment) <= SFTP_PIPELINE_DEPTH);
+    }
+
+    #[test]
+    fn pipeline_segment_len_small_input_is_one_alignment_unit() {
+        assert_eq!(
+            pipeline_segment_len(SFTP_SEGMENT_ALIGN + 1),
+            SFTP_SEGMENT_ALIGN
+        );
+    }
+
+    #[test]
+    fn shrunk_len_none_when_every_segment_filled() {
+        assert_eq!(shrunk_len(10, &[(10, 10), (10, 10), (5, 5)]), None);
+    }
+
+    #[test]
+    fn shrunk_len_stops_at_first_eof() {
+        // 2 区間目の途中で EOF、以降の区間は 0 バイト
+        assert_eq!(shrunk_len(10, &[(10, 10), (4, 10), (0, 5)]), Some(14));
+        // 最終区間だけ短い
+        assert_eq!(shrunk_len(10, &[(10, 10), (10, 10), (2, 5)]), Some(22));
+    }
+
+    #[tokio::test]
+    async fn read_up_to_stops_at_eof() {
+        let mut reader: &[u8] = b"abc";
+        let mut buf = [0u8; 8];
+        assert_eq!(read_up_to(&mut reader, &mut buf).await.unwrap(), 3);
+        assert_eq!(&buf[..3], b"abc");
+    }
+
+    #[tokio::test]
+    async fn read_up_to_fills_buffer_across_short_reads() {
+        let mut reader = tokio::io::AsyncReadExt::chain(&b"ab"[..], &b"cdef"[..]);
+        let mut buf = [0u8; 4];
+        assert_eq!(read_up_to(&mut reader, &mut buf).await.unwrap(), 4);
+        assert_eq!(&buf, b"abcd");
+    }
+}
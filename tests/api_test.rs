@@ -1170,6 +1170,57 @@ async fn sftp_search_not_connected() {
     assert_eq!(resp.status(), StatusCode::SERVICE_UNAVAILABLE);
 }
 
+#[tokio::test]
+async fn sftp_batch_not_connected() {
+    let app = test_app();
+    let req = Request::builder()
+        .method("POST")
+        .uri("/api/sftp/batch")
+        .header(header::CONTENT_TYPE, "application/json")
+        .header(header::AUTHORIZATION, auth_header())
+        .body(Body::from(
+            r#"{"ops":[{"op":"mkdir","path":"/tmp/newdir"},{"op":"read","path":"/tmp/test.txt"}]}"#,
+        ))
+        .unwrap();
+
+    let resp = app.oneshot(req).await.unwrap();
+    assert_eq!(resp.status(), StatusCode::SERVICE_UNAVAILABLE);
+}
+
+#[tokio::test]
+async fn sftp_batch_too_many_ops() {
+    // 操作数チェックは SFTP 接続の取得より前に行われる
+    let app = test_app();
+    let ops = vec![r#"{"op":"mkdir","path":"/tmp/newdir"}"#; 101].join(",");
+    let req = Request::builder()
+        .method("POST")
+        .uri("/api/sftp/batch")
+        .header(header::CONTENT_TYPE, "application/json")
+        .header(header::AUTHORIZATION, auth_header())
+        .body(Body::from(format!(r#"{{"ops":[{ops}]}}"#)))
+        .unwrap();
+
+    let resp = app.oneshot(req).await.unwrap();
+    assert_eq!(resp.status(), StatusCode::PAYLOAD_TOO_LARGE);
+}
+
+#[tokio::test]
+async fn sftp_batch_unknown_op() {
+    let app = test_app();
+    let req = Request::builder()
+        .method("POST")
+        .uri("/api/sftp/batch")
+        .header(header::CONTENT_TYPE, "application/json")
+        .header(header::AUTHORIZATION, auth_header())
+        .body(Body::from(
+            r#"{"ops":[{"op":"chmod","path":"/tmp/test.txt"}]}"#,
+        ))
+        .unwrap();
+
+    let resp = app.oneshot(req).await.unwrap();
+    assert_eq!(resp.status(), StatusCode::UNPROCESSABLE_ENTITY);
+}
+
 #[tokio::test]
 async fn sftp_connect_missing_fields() {
     let app = test_app();
@@ -1345,6 +1396,30 @@ async fn sftp_upload_not_connected() {
     assert_eq!(resp.status(), StatusCode::SERVICE_UNAVAILABLE);
 }
 
+#[tokio::test]
+async fn sftp_upload_above_default_body_limit_reaches_handler() {
+    // axum の既定 2MB 上限で弾かれず、ハンドラーまで届く（未接続なので 503）
+    let app = test_app();
+    let boundary = "----TestBoundary";
+    let mut body = Vec::new();
+    body.extend_from_slice(b"------TestBoundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.bin\"\r\nContent-Type: application/octet-stream\r\n\r\n");
+    body.extend(std::iter::repeat_n(b'x', 3 * 1024 * 1024));
+    body.extend_from_slice(b"\r\n------TestBoundary--\r\n");
+    let req = Request::builder()
+        .method("POST")
+        .uri("/api/sftp/upload")
+        .header(
+            header::CONTENT_TYPE,
+            format!("multipart/form-data; boundary={}", boundary),
+        )
+        .header(header::AUTHORIZATION, auth_header())
+        .body(Body::from(body))
+        .unwrap();
+
+    let resp = app.oneshot(req).await.unwrap();
+    assert_eq!(resp.status(), StatusCode::SERVICE_UNAVAILABLE);
+}
+
 #[tokio::test]
 async fn sftp_write_empty_path() {
     let app = test_app();
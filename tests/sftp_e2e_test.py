@@ -21,14 +21,25 @@ Environment variables:
     DEN_SFTP_PORT    SFTP target port       (default: 22)
     DEN_SFTP_USER    SFTP username          (required)
     DEN_SFTP_PASS    SFTP password          (required)
+    DEN_TEST_UPLOAD_BUDGET  Seconds allowed for the large upload test (default: 60)
+
+The test classes run serially, in definition order: Den holds a single SFTP
+connection, so TestSftpConnect -> TestSftpFileOps -> TestSftpDisconnect build
+on each other's state and cannot be sharded across workers.
 """
 
+import concurrent.futures
+import functools
+import hashlib
 import os
+import secrets
 import sys
 import time
 import unittest
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 DEN_URL = os.environ.get("DEN_URL", "http://127.0.0.1:3000")
 DEN_PASSWORD = os.environ.get("DEN_PASSWORD", "test")
@@ -37,8 +48,24 @@ SFTP_PORT = int(os.environ.get("DEN_SFTP_PORT", "22"))
 SFTP_USER = os.environ.get("DEN_SFTP_USER", "")
 SFTP_PASS = os.environ.get("DEN_SFTP_PASS", "")
 
+# /api/sftp/connect body for the configured target
+CONNECT_PAYLOAD = {
+    "host": SFTP_HOST,
+    "port": SFTP_PORT,
+    "username": SFTP_USER,
+    "auth_type": "password",
+    "password": SFTP_PASS,
+}
+
+# Round-trip payload; well above Den's 128 KiB single-handle threshold
+PIPELINED_PAYLOAD_SIZE = 8 << 20
+
+# Large-upload regression test: 32 MiB stays under Den's 50 MB upload cap
+LARGE_UPLOAD_SIZE = 32 << 20
+UPLOAD_BUDGET = float(os.environ.get("DEN_TEST_UPLOAD_BUDGET", "60"))
+
 # Test directory on the remote host (created/cleaned by tests)
-TEST_DIR = f"/tmp/den-sftp-e2e-{int(time.time())}"
+TEST_DIR = f"/tmp/den-sftp-e2e-{secrets.token_hex(4)}"
 
 
 class DenSession:
@@ -46,15 +73,39 @@ class DenSession:
 
     def __init__(self):
         self.session = requests.Session()
+        # Keep-alive pool for the single Den host. Retry connection setup only:
+        # Den answers 502/503 for SSH errors and "not connected", which the
+        # tests assert on, so status codes must not be retried.
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.1),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self._login()
 
     def _login(self):
         resp = self.session.post(
             f"{DEN_URL}/api/login",
             json={"password": DEN_PASSWORD},
+            timeout=(2, 10),
         )
         resp.raise_for_status()
 
+    def worker_session(self):
+        """Return a new requests.Session carrying this session's auth cookie.
+
+        requests.Session is not thread-safe, so each concurrent caller gets
+        its own instead of sharing self.session.
+        """
+        session = requests.Session()
+        session.cookies.update(self.session.cookies)
+        return session
+
+    def request(self, method, path, **kwargs):
+        return self.session.request(method, f"{DEN_URL}{path}", **kwargs)
+
     def get(self, path, **kwargs):
         return self.session.get(f"{DEN_URL}{path}", **kwargs)
 
@@ -68,15 +119,10 @@ class DenSession:
         return self.session.delete(f"{DEN_URL}{path}", **kwargs)
 
 
-# Shared session for all tests
-_den = None
-
-
+@functools.lru_cache(maxsize=None)
 def den():
-    global _den
-    if _den is None:
-        _den = DenSession()
-    return _den
+    """Shared session for all tests (logged in on first use)."""
+    return DenSession()
 
 
 class TestSftpConnect(unittest.TestCase):
@@ -91,13 +137,7 @@ class TestSftpConnect(unittest.TestCase):
     def test_02_connect(self):
         resp = den().post(
             "/api/sftp/connect",
-            json={
-                "host": SFTP_HOST,
-                "port": SFTP_PORT,
-                "username": SFTP_USER,
-                "auth_type": "password",
-                "password": SFTP_PASS,
-            },
+            json=CONNECT_PAYLOAD,
         )
         self.assertEqual(resp.status_code, 200, resp.text)
         data = resp.json()
@@ -111,16 +151,13 @@ class TestSftpConnect(unittest.TestCase):
         data = resp.json()
         self.assertTrue(data["connected"])
 
+    # Stays in this class rather than a separate bad-auth class: Den holds one
+    # SFTP connection, a failed connect replaces it, and test_05_reconnect must
+    # run right after to restore it for TestSftpFileOps.
     def test_04_connect_wrong_password(self):
         resp = den().post(
             "/api/sftp/connect",
-            json={
-                "host": SFTP_HOST,
-                "port": SFTP_PORT,
-                "username": SFTP_USER,
-                "auth_type": "password",
-                "password": "wrong_password_xyz",
-            },
+            json={**CONNECT_PAYLOAD, "password": "wrong_password_xyz"},
         )
         # Should fail with 401 (AuthFailed) or 502 (SSH error)
         self.assertIn(resp.status_code, [401, 502], resp.text)
@@ -129,13 +166,7 @@ class TestSftpConnect(unittest.TestCase):
         """Reconnect after failed auth."""
         resp = den().post(
             "/api/sftp/connect",
-            json={
-                "host": SFTP_HOST,
-                "port": SFTP_PORT,
-                "username": SFTP_USER,
-                "auth_type": "password",
-                "password": SFTP_PASS,
-            },
+            json=CONNECT_PAYLOAD,
         )
         self.assertEqual(resp.status_code, 200, resp.text)
         self.assertTrue(resp.json()["connected"])
@@ -151,21 +182,30 @@ class TestSftpFileOps(unittest.TestCase):
         if not resp.json().get("connected"):
             den().post(
                 "/api/sftp/connect",
-                json={
-                    "host": SFTP_HOST,
-                    "port": SFTP_PORT,
-                    "username": SFTP_USER,
-                    "auth_type": "password",
-                    "password": SFTP_PASS,
-                },
+                json=CONNECT_PAYLOAD,
             )
-        # Create test directory
-        den().post("/api/sftp/mkdir", json={"path": TEST_DIR})
+        # Create test directory through the batch endpoint, so fixtures added
+        # here later cost no extra round-trips. This stays class-scoped rather
+        # than moving to setUpModule: creating it needs a live SFTP connection,
+        # and TestSftpConnect must start from the disconnected state.
+        resp = den().post(
+            "/api/sftp/batch",
+            json={"ops": [{"op": "mkdir", "path": TEST_DIR}]},
+        )
+        resp.raise_for_status()
+        statuses = [r["status"] for r in resp.json()["results"]]
+        if statuses != [201]:
+            raise RuntimeError(f"fixture setup failed: {resp.text}")
+
+    @classmethod
+    def tearDownClass(cls):
+        # Recursive delete; TestSftpDisconnect runs next and drops the connection
+        den().delete("/api/sftp/delete", params={"path": TEST_DIR})
 
     def test_01_mkdir(self):
         path = f"{TEST_DIR}/subdir"
         resp = den().post("/api/sftp/mkdir", json={"path": path})
-        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(resp.status_code, 201, resp.text)
 
     def test_02_write_and_read(self):
         path = f"{TEST_DIR}/hello.txt"
@@ -207,21 +247,32 @@ class TestSftpFileOps(unittest.TestCase):
         self.assertEqual(resp.json()["content"], "Hello, SFTP!")
 
     def test_05_upload_and_download(self):
+        # Several MiB, so both directions take Den's multi-handle pipelined path
         path = TEST_DIR
+        payload = os.urandom(PIPELINED_PAYLOAD_SIZE)
         resp = den().post(
             "/api/sftp/upload",
             data={"path": path},
-            files={"file": ("upload_test.txt", b"uploaded content", "text/plain")},
+            files={"file": ("upload_test.bin", payload, "application/octet-stream")},
         )
-        self.assertEqual(resp.status_code, 200, resp.text)
+        self.assertEqual(resp.status_code, 201, resp.text)
 
-        # Download
-        resp = den().get(
+        # Download streamed into a digest, so the body is never held in memory
+        digest = hashlib.blake2b(digest_size=16)
+        received = 0
+        with den().get(
             "/api/sftp/download",
-            params={"path": f"{path}/upload_test.txt"},
+            params={"path": f"{path}/upload_test.bin"},
+            stream=True,
+        ) as resp:
+            self.assertEqual(resp.status_code, 200, resp.text)
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                digest.update(chunk)
+                received += len(chunk)
+        self.assertEqual(received, len(payload))
+        self.assertEqual(
+            digest.digest(), hashlib.blake2b(payload, digest_size=16).digest()
         )
-        self.assertEqual(resp.status_code, 200, resp.text)
-        self.assertEqual(resp.content, b"uploaded content")
 
     def test_06_search(self):
         # Write a searchable file
@@ -254,6 +305,77 @@ class TestSftpFileOps(unittest.TestCase):
         resp = den().delete("/api/sftp/delete", params={"path": path})
         self.assertEqual(resp.status_code, 200, resp.text)
 
+    def test_09_batch(self):
+        """Several ops in one request, run in order on one SFTP guard."""
+        base = f"{TEST_DIR}/batch"
+        resp = den().post(
+            "/api/sftp/batch",
+            json={
+                "ops": [
+                    {"op": "mkdir", "path": base},
+                    {"op": "write", "path": f"{base}/a.txt", "content": "batched"},
+                    {"op": "rename", "from": f"{base}/a.txt", "to": f"{base}/b.txt"},
+                    {"op": "read", "path": f"{base}/b.txt"},
+                    {"op": "delete", "path": base},
+                ]
+            },
+        )
+        self.assertEqual(resp.status_code, 200, resp.text)
+        results = resp.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 200, 200, 200, 200])
+        self.assertEqual(results[3]["content"], "batched")
+
+    def test_10_batch_stops_at_first_error(self):
+        missing = f"{TEST_DIR}/no-such-file.txt"
+        resp = den().post(
+            "/api/sftp/batch",
+            json={
+                "ops": [
+                    {"op": "read", "path": missing},
+                    {"op": "mkdir", "path": f"{TEST_DIR}/never-created"},
+                ]
+            },
+        )
+        self.assertEqual(resp.status_code, 200, resp.text)
+        results = resp.json()["results"]
+        self.assertEqual(len(results), 1)
+        self.assertNotEqual(results[0]["status"], 200)
+        self.assertIn("error", results[0])
+
+    def test_11_large_upload_within_budget(self):
+        """Catch regressions to small per-request writes on the upload path."""
+        start = time.monotonic()
+        resp = den().post(
+            "/api/sftp/upload",
+            data={"path": TEST_DIR},
+            files={"file": ("big.bin", os.urandom(LARGE_UPLOAD_SIZE))},
+        )
+        elapsed = time.monotonic() - start
+        self.assertEqual(resp.status_code, 201, resp.text)
+        self.assertLess(
+            elapsed,
+            UPLOAD_BUDGET,
+            f"{LARGE_UPLOAD_SIZE >> 20} MiB upload took {elapsed:.1f}s",
+        )
+
+    def test_12_batch_read_total_is_capped(self):
+        """Reads in one batch share the single-read 10 MB cap."""
+        resp = den().post(
+            "/api/sftp/upload",
+            data={"path": TEST_DIR},
+            files={"file": ("six.bin", os.urandom(6 << 20))},
+        )
+        self.assertEqual(resp.status_code, 201, resp.text)
+
+        path = f"{TEST_DIR}/six.bin"
+        resp = den().post(
+            "/api/sftp/batch",
+            json={"ops": [{"op": "read", "path": path}, {"op": "read", "path": path}]},
+        )
+        self.assertEqual(resp.status_code, 200, resp.text)
+        statuses = [r["status"] for r in resp.json()["results"]]
+        self.assertEqual(statuses, [200, 413])
+
 
 class TestSftpDisconnect(unittest.TestCase):
     """Test disconnect (runs last)."""
@@ -263,8 +385,33 @@ class TestSftpDisconnect(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
 
     def test_02_ops_after_disconnect_return_503(self):
-        resp = den().get("/api/sftp/list", params={"path": "/", "show_hidden": "false"})
-        self.assertEqual(resp.status_code, 503)
+        path = f"{TEST_DIR}/after-disconnect.txt"
+        ops = [
+            ("GET", "/api/sftp/list", {"params": {"path": "/", "show_hidden": "false"}}),
+            ("GET", "/api/sftp/read", {"params": {"path": path}}),
+            ("PUT", "/api/sftp/write", {"json": {"path": path, "content": "x"}}),
+            ("POST", "/api/sftp/mkdir", {"json": {"path": TEST_DIR}}),
+            ("POST", "/api/sftp/rename", {"json": {"from": path, "to": f"{path}.bak"}}),
+            ("DELETE", "/api/sftp/delete", {"params": {"path": path}}),
+            ("GET", "/api/sftp/download", {"params": {"path": path}}),
+            ("POST", "/api/sftp/upload", {"files": {"file": ("a.txt", b"x", "text/plain")}}),
+            ("GET", "/api/sftp/search", {"params": {"path": "/", "query": "x"}}),
+            ("POST", "/api/sftp/batch", {"json": {"ops": [{"op": "read", "path": path}]}}),
+        ]
+
+        def send(op):
+            method, endpoint, kwargs = op
+            with den().worker_session() as session:
+                return session.request(method, f"{DEN_URL}{endpoint}", **kwargs)
+
+        # Independent checks, so send them all at once: one round-trip of wall
+        # time instead of one per endpoint
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(ops)) as pool:
+            responses = list(pool.map(send, ops))
+
+        for (method, endpoint, _), resp in zip(ops, responses):
+            with self.subTest(method=method, endpoint=endpoint):
+                self.assertEqual(resp.status_code, 503, resp.text)
 
     def test_03_status_after_disconnect(self):
         resp = den().get("/api/sftp/status")
@@ -292,8 +439,10 @@ if __name__ == "__main__":
     # Check Den connectivity
     print(f"Testing Den at {DEN_URL}")
     try:
-        resp = requests.get(f"{DEN_URL}/api/sftp/status", timeout=5)
-        # Will get 401 without auth, but proves server is up
+        # Goes through the shared session, so the login and this HEAD open the
+        # pooled keep-alive connection the tests reuse. HEAD skips the body;
+        # (connect, read) timeouts fail fast when nothing listens.
+        resp = den().session.head(f"{DEN_URL}/api/sftp/status", timeout=(2, 5))
         print(f"Den reachable (status {resp.status_code})")
     except Exception as e:
         print(f"Cannot connect to Den: {e}")
@@ -13,10 +13,28 @@ Usage:
     #
     # Custom host/port:
     DEN_TEST_SSH_HOST=192.168.1.10 DEN_TEST_SSH_PORT=2222 python tests/ssh_test.py
+    #
+    # Test classes are independent and run in parallel (one class per worker).
+    # Set DEN_TEST_WORKERS=1 to run serially via unittest.main():
+    DEN_TEST_WORKERS=1 python tests/ssh_test.py
+    #
+    # Replay-receiving clients negotiate zlib compression; disable with:
+    DEN_TEST_SSH_COMPRESS=0 python tests/ssh_test.py
+    #
+    # Fast mode: once a prompt has been seen, cap later exec_pty waits at a
+    # multiple of the slowest observed prompt latency:
+    python tests/ssh_test.py --fast
 """
 
+import concurrent.futures
+import io
 import os
+import re
+import secrets
+import selectors
+import socket
 import sys
+import threading
 import time
 import unittest
 
@@ -30,11 +48,82 @@ SSH_PASS = os.environ.get("DEN_TEST_SSH_PASS", "test")
 # russh の auth_rejection_time (3s) より長く設定
 AUTH_TIMEOUT = 15
 
+# Client-side keepalive (seconds), matching the server's SSH_KEEPALIVE_INTERVAL.
+# Keeps shared_client() alive between tests and lets a dead peer surface as
+# an inactive transport instead of a hung recv().
+KEEPALIVE_INTERVAL = 30
+
+# zlib transport compression for clients that receive a session's replay
+# buffer (attach/reconnect); DEN_TEST_SSH_COMPRESS=0 turns it off
+REPLAY_COMPRESS = os.environ.get("DEN_TEST_SSH_COMPRESS", "1") == "1"
+
+# Bytes per channel.recv(). recv() returns whatever is buffered (up to this),
+# so a small ANSI reply costs the same either way, while replay bursts drain
+# in fewer calls; 32 KiB matches paramiko's max packet payload.
+RECV_SIZE = 32 * 1024
+
+# Per-channel receive window for channels opened on test transports. Replay
+# and shell output arrive in bursts; a large window keeps the server from
+# stalling on WINDOW_ADJUST round-trips mid-burst.
+CHANNEL_WINDOW_SIZE = 16 * 1024 * 1024
+
+# Device Status Report query ConPTY sends on startup; it blocks until a CPR arrives
+DSR_QUERY = b"\x1b[6n"
+_DSR_RE = re.compile(re.escape(DSR_QUERY))
+
+# Shell prompt markers (cmd/pwsh ">", "PS ", POSIX "$"); all ASCII, so the
+# detector runs on raw bytes without decoding
+_PROMPT_RE = re.compile(rb">|PS |\$")
+
+# --fast / DEN_TEST_FAST=1: shrink exec_pty's duration to FAST_FACTOR times
+# the slowest prompt latency seen so far (never below FAST_MIN_DURATION)
+FAST_MODE = os.environ.get("DEN_TEST_FAST") == "1"
+FAST_FACTOR = 4
+FAST_MIN_DURATION = 0.5
+
+# Slowest time (seconds) exec_pty has taken to satisfy until(); None until
+# the first match
+_observed_match_s = None
+
+# Worker threads for run_parallel(); the suite is I/O-bound, not CPU-bound
+TEST_WORKERS = int(os.environ.get("DEN_TEST_WORKERS", str(os.cpu_count() or 1)))
+
+
+# known_hosts entry name paramiko looks up for a non-22 port
+_HOST_KEY_NAME = SSH_HOST if SSH_PORT == 22 else f"[{SSH_HOST}]:{SSH_PORT}"
 
-def ssh_connect():
-    """Create and return a connected SSH client."""
+# Server host key, learned on the first connect and preloaded into every
+# later client so verification is a plain lookup
+_host_key = None
+
+
+class _TrustTestServer(paramiko.MissingHostKeyPolicy):
+    """Accept the test server's key on first sight and remember it."""
+
+    def missing_host_key(self, client, hostname, key):
+        global _host_key
+        _host_key = key
+
+
+_TRUST_POLICY = _TrustTestServer()
+
+
+def new_client():
+    """Return an unconnected SSHClient that trusts the test server's host key."""
     client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.set_missing_host_key_policy(_TRUST_POLICY)
+    if _host_key is not None:
+        client.get_host_keys().add(_HOST_KEY_NAME, _host_key.get_name(), _host_key)
+    return client
+
+
+def ssh_connect(compress=False):
+    """Create and return a connected SSH client.
+
+    compress=True negotiates zlib transport compression; worth it for clients
+    that attach to an existing session and receive its replay buffer.
+    """
+    client = new_client()
     client.connect(
         SSH_HOST,
         port=SSH_PORT,
@@ -44,184 +133,361 @@ def ssh_connect():
         auth_timeout=AUTH_TIMEOUT,
         allow_agent=False,
         look_for_keys=False,
+        compress=compress,
     )
+    transport = client.get_transport()
+    # Keystrokes, CPR replies and echoes are tiny packets; don't let Nagle
+    # hold them back waiting for an ACK
+    transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    transport.set_keepalive(KEEPALIVE_INTERVAL)
+    # Picked up by every later open_session() on this transport
+    transport.default_window_size = CHANNEL_WINDOW_SIZE
     return client
 
 
+_shared = threading.local()
+
+
+def _thread_client(name):
+    """Return this thread's cached client stored under name, reconnecting if dead."""
+    client = getattr(_shared, name, None)
+    transport = client.get_transport() if client else None
+    if transport is None or not transport.is_active():
+        client = ssh_connect()
+        setattr(_shared, name, client)
+    return client
+
+
+def shared_client():
+    """Return this thread's long-lived SSH client for non-PTY exec commands.
+
+    Den keeps channel/PTY state per SSH connection (one channel at a time, and
+    a PTY request sticks to the connection), so non-interactive commands get
+    a transport of their own. It is per thread because run_parallel() runs
+    test classes concurrently.
+    """
+    return _thread_client("client")
+
+
+def shared_pty_client():
+    """Return this thread's long-lived SSH client for PTY sessions.
+
+    Den serves one interactive channel per connection at a time, so tests
+    using it must close their channel (tearDown) before the next test opens
+    one. Tests that need two live sessions at once, a real disconnect, or a
+    command the server answers by dropping the connection still call
+    ssh_connect().
+    """
+    return _thread_client("pty_client")
+
+
 def exec_simple(client, command):
     """Execute a non-interactive SSH command and return stdout."""
     channel = client.get_transport().open_session()
     channel.exec_command(command)
-    channel.settimeout(5.0)
-    output = b""
-    try:
-        while True:
-            data = channel.recv(4096)
-            if not data:
-                break
-            output += data
-    except Exception:
-        pass
+    # Non-PTY commands write their reply and close the channel, so this reads
+    # to EOF; on timeout, whatever already arrived is kept for the caller.
+    output = bytearray()
+    for data in iter_recv(channel, 5.0):
+        output += data
     channel.close()
     return output.decode("utf-8", errors="replace")
 
 
-def exec_pty(client, command, width=80, height=24, duration=6):
-    """Execute a PTY-attached SSH command, respond to DSR queries, return output."""
+_preflight_lock = threading.Lock()
+_preflight_done = False
+_preflight_error = None
+
+
+def check_server():
+    """Probe the server once per process; return the connect error, or None.
+
+    Later calls reuse the first result, so an unreachable server costs one
+    connect timeout rather than one per test class. The probe connection is
+    kept as the calling thread's shared_client(); shared clients are per
+    thread, so under run_parallel() only the worker that probed reuses it.
+    """
+    global _preflight_done, _preflight_error
+    with _preflight_lock:
+        if not _preflight_done:
+            try:
+                _shared.client = ssh_connect()
+            except Exception as e:
+                _preflight_error = e
+            _preflight_done = True
+    return _preflight_error
+
+
+def setUpModule():
+    error = check_server()
+    if error is not None:
+        raise unittest.SkipTest(
+            f"SSH server unreachable at {SSH_HOST}:{SSH_PORT}: {error}"
+        )
+
+
+def wait_for_listed(text, timeout=3, interval=0.1):
+    """Poll `list` until text appears in its output; return the last output.
+
+    Lets a test continue as soon as the server reports the expected session
+    state instead of sleeping for a fixed worst-case delay.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        output = exec_simple(shared_client(), "list")
+        if text in output or time.monotonic() >= deadline:
+            return output
+        time.sleep(interval)
+
+
+def dsr_in_tail(buf, new_len):
+    """Return True if DSR_QUERY occurs in the last new_len bytes appended to buf.
+
+    Only the fresh tail (plus enough overlap to catch a query split across
+    recv() chunks) is scanned, so the accumulated buffer is never re-copied or
+    rescanned from the start.
+    """
+    start = max(0, len(buf) - new_len - len(DSR_QUERY) + 1)
+    return _DSR_RE.search(buf, start) is not None
+
+
+def open_pty_channel(client, command, width=80, height=24):
+    """Open a session channel, request an xterm PTY and exec command on it.
+
+    SSH channels are single-use (one exec each), so this is the shared setup
+    path rather than a cache; the transport underneath is what gets reused.
+    """
     channel = client.get_transport().open_session()
     channel.get_pty(term="xterm-256color", width=width, height=height)
     channel.exec_command(command)
-    channel.settimeout(1.0)
+    return channel
 
-    all_output = b""
-    cpr_sent = False
-    start = time.time()
 
-    while time.time() - start < duration:
-        try:
-            data = channel.recv(4096)
+def has_prompt(output):
+    """Return True if output contains something that looks like a shell prompt."""
+    return _PROMPT_RE.search(output) is not None
+
+
+def exec_pty(client, command, width=80, height=24, duration=6, until=None, settle=0.3):
+    """Execute a PTY-attached SSH command, respond to DSR queries, return output.
+
+    Reads for at most duration seconds. Once until(output) is true, it returns
+    as soon as the channel has been quiet for settle seconds, so trailing
+    output (and a late DSR query) is still consumed.
+
+    In FAST_MODE, duration is capped from the latency of earlier matches.
+    """
+    global _observed_match_s
+
+    if FAST_MODE and until is not None and _observed_match_s is not None:
+        duration = min(
+            duration, max(FAST_MIN_DURATION, FAST_FACTOR * _observed_match_s)
+        )
+
+    channel = open_pty_channel(client, command, width=width, height=height)
+
+    all_output = bytearray()
+    cpr_sent = False
+    matched = False
+    # Monotonic, so an NTP step mid-run can't stretch or cut the budget
+    start = time.monotonic()
+    deadline = start + duration
+
+    # Block on the channel's readiness fd instead of polling recv() with a
+    # timeout; recv() is only called once data (or EOF) is pending.
+    with selectors.DefaultSelector() as selector:
+        selector.register(channel, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic()
+            if matched:
+                remaining = min(remaining, settle)
+            if remaining <= 0 or not selector.select(remaining):
+                break
+            data = channel.recv(RECV_SIZE)
             if not data:
                 break
             all_output += data
 
             # Respond to DSR query: ESC[6n -> ESC[1;1R
-            if b"\x1b[6n" in data and not cpr_sent:
+            if not cpr_sent and dsr_in_tail(all_output, len(data)):
                 channel.send(b"\x1b[1;1R")
                 cpr_sent = True
-        except Exception:
-            pass
 
-    return channel, all_output
+            if until is not None and not matched:
+                matched = until(all_output)
+                if matched:
+                    elapsed = time.monotonic() - start
+                    if _observed_match_s is None or elapsed > _observed_match_s:
+                        _observed_match_s = elapsed
+
+    return channel, bytes(all_output)
+
+
+def iter_recv(channel, timeout):
+    """Yield chunks from channel as they arrive until EOF or timeout seconds pass.
+
+    Waits in select() for the time remaining before the deadline instead of
+    spinning on recv() with a short socket timeout.
+    """
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        selector.register(channel, selectors.EVENT_READ)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not selector.select(remaining):
+                return
+            data = channel.recv(RECV_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def read_until(channel, marker, timeout=5):
+    """Read from channel until marker appears (or timeout/EOF), return bytes read."""
+    output = bytearray()
+    for data in iter_recv(channel, timeout):
+        output += data
+        # Scan only the new chunk plus a marker-sized overlap, as dsr_in_tail does
+        if output.find(marker, max(0, len(output) - len(data) - len(marker) + 1)) >= 0:
+            break
+    return bytes(output)
+
+
+class _PtySessionTest(unittest.TestCase):
+    """Base for tests that drive one PTY session over shared_pty_client()."""
+
+    session_prefix = "ssh-test"
+
+    def setUp(self):
+        self.client = shared_pty_client()
+        self.session_name = f"{self.session_prefix}-{secrets.token_hex(4)}"
+        self.channel = None
+
+    def tearDown(self):
+        # Frees the shared connection's channel slot for the next test
+        if self.channel and not self.channel.closed:
+            self.channel.close()
+
+
+class _MultiClientTest(unittest.TestCase):
+    """Base for tests that need several concurrent clients on one session."""
+
+    session_prefix = "ssh-multi"
+
+    def setUp(self):
+        self.clients = []
+        self.channels = []
+        self.session_name = f"{self.session_prefix}-{secrets.token_hex(4)}"
+
+    def tearDown(self):
+        for ch in self.channels:
+            if not ch.closed:
+                ch.close()
+        for c in self.clients:
+            c.close()
+
+    def open_client(self, command, compress=False, **kwargs):
+        """Connect a new client, run command via exec_pty; closed in tearDown."""
+        client = ssh_connect(compress=compress)
+        self.clients.append(client)
+        channel, output = exec_pty(client, command, **kwargs)
+        self.channels.append(channel)
+        return channel, output
 
 
 class TestSSHList(unittest.TestCase):
     """Test the 'list' command (non-interactive)."""
 
     def test_list_returns_output(self):
-        client = ssh_connect()
-        output = exec_simple(client, "list")
+        output = exec_simple(shared_client(), "list")
         # Should return either "No active sessions" or "Sessions:"
         self.assertTrue(
             "No active sessions" in output or "Sessions:" in output,
             f"Unexpected list output: {output!r}",
         )
-        client.close()
 
 
-class TestSSHNewSession(unittest.TestCase):
+class TestSSHNewSession(_PtySessionTest):
     """Test creating a new PTY session via SSH."""
 
-    def setUp(self):
-        self.client = ssh_connect()
-        self.session_name = f"ssh-test-{int(time.time())}"
-        self.channel = None
-
-    def tearDown(self):
-        if self.channel and not self.channel.closed:
-            self.channel.close()
-        self.client.close()
-
     def test_new_session_shows_prompt(self):
         """Creating a new session should show shell prompt."""
-        self.channel, output = exec_pty(self.client, f"new {self.session_name}")
-        text = output.decode("utf-8", errors="replace")
-
+        self.channel, output = exec_pty(
+            self.client, f"new {self.session_name}", until=has_prompt
+        )
         # Shell prompt should contain recognizable characters
-        has_prompt = ">" in text or "PS " in text or "$" in text
-        self.assertTrue(has_prompt, f"Shell prompt not found in output: {text!r}")
+        self.assertTrue(
+            has_prompt(output), f"Shell prompt not found in output: {output!r}"
+        )
 
     def test_new_session_input_works(self):
         """Typing into the session should produce output."""
         self.channel, output = exec_pty(
-            self.client, f"new {self.session_name}", duration=4
+            self.client, f"new {self.session_name}", duration=4, until=has_prompt
         )
-        text = output.decode("utf-8", errors="replace")
 
-        if ">" not in text and "PS " not in text and "$" not in text:
+        if not has_prompt(output):
             self.skipTest("Shell prompt did not appear")
 
         # Send a command
         self.channel.send(b"echo HELLO_SSH_TEST\r\n")
-        time.sleep(2)
-
-        try:
-            extra = self.channel.recv(4096)
-            extra_text = extra.decode("utf-8", errors="replace")
-            self.assertIn(
-                "HELLO_SSH_TEST", extra_text, "echo output not received"
-            )
-        except Exception as e:
-            self.fail(f"Failed to receive echo output: {e}")
+        extra = read_until(self.channel, b"HELLO_SSH_TEST")
+        self.assertIn(b"HELLO_SSH_TEST", extra, f"echo output not received: {extra!r}")
 
     def test_da_response_filtered(self):
         """DA responses should be filtered and not appear as shell input."""
         self.channel, output = exec_pty(
-            self.client, f"new {self.session_name}", duration=4
+            self.client, f"new {self.session_name}", duration=4, until=has_prompt
         )
-        text = output.decode("utf-8", errors="replace")
-
-        if ">" not in text and "PS " not in text and "$" not in text:
+        if not has_prompt(output):
             self.skipTest("Shell prompt did not appear")
 
-        # Send a DA response (should be filtered by the server)
+        # Send a DA response (should be filtered by the server). No pause is
+        # needed: channel data arrives in order and the server filters each
+        # chunk on its own, so the DA reply is stripped whether or not it
+        # shares a packet with the echo, and the echo marker below is the
+        # sync point.
         self.channel.send(b"\x1b[?1;2c")
-        time.sleep(1)
 
         # Send a known command to check the shell is still clean
         self.channel.send(b"echo DA_FILTER_OK\r\n")
-        time.sleep(2)
-
-        try:
-            extra = self.channel.recv(8192)
-            extra_text = extra.decode("utf-8", errors="replace")
-            # The DA response should NOT appear as garbled text before our echo
-            self.assertIn("DA_FILTER_OK", extra_text)
-            # Check that the raw DA sequence didn't leak into shell output
-            self.assertNotIn("[?1;2c", extra_text)
-        except Exception as e:
-            self.fail(f"Failed to verify DA filter: {e}")
+        extra = read_until(self.channel, b"DA_FILTER_OK")
+        # The DA response should NOT appear as garbled text before our echo
+        self.assertIn(b"DA_FILTER_OK", extra)
+        # Check that the raw DA sequence didn't leak into shell output
+        self.assertNotIn(b"[?1;2c", extra)
 
 
-class TestSSHAttach(unittest.TestCase):
+class TestSSHAttach(_MultiClientTest):
     """Test attaching to an existing session."""
 
-    def setUp(self):
-        self.clients = []
-        self.channels = []
-        self.session_name = f"ssh-attach-{int(time.time())}"
-
-    def tearDown(self):
-        for ch in self.channels:
-            if not ch.closed:
-                ch.close()
-        for c in self.clients:
-            c.close()
+    session_prefix = "ssh-attach"
 
     def test_attach_existing_session(self):
         """Attaching to an existing session should show replay data."""
         # Create session with first client
-        client1 = ssh_connect()
-        self.clients.append(client1)
-        ch1, output1 = exec_pty(client1, f"new {self.session_name}", duration=4)
-        self.channels.append(ch1)
+        _, output1 = self.open_client(
+            f"new {self.session_name}", duration=4, until=has_prompt
+        )
 
-        text1 = output1.decode("utf-8", errors="replace")
-        if ">" not in text1 and "PS " not in text1 and "$" not in text1:
+        if not has_prompt(output1):
             self.skipTest("Shell prompt did not appear")
 
         # Attach with second client
-        client2 = ssh_connect()
-        self.clients.append(client2)
-        ch2, output2 = exec_pty(client2, f"attach {self.session_name}", duration=4)
-        self.channels.append(ch2)
+        _, output2 = self.open_client(
+            f"attach {self.session_name}",
+            compress=REPLAY_COMPRESS,
+            duration=4,
+            until=has_prompt,
+        )
 
-        text2 = output2.decode("utf-8", errors="replace")
         # Replay should contain part of the prompt
-        has_prompt = ">" in text2 or "PS " in text2 or "$" in text2
-        self.assertTrue(has_prompt, f"Replay data should contain prompt: {text2!r}")
+        self.assertTrue(
+            has_prompt(output2), f"Replay data should contain prompt: {output2!r}"
+        )
 
 
-class TestSSHDsrDelivery(unittest.TestCase):
+class TestSSHDsrDelivery(_PtySessionTest):
     """Test that ConPTY's DSR query reaches the client via broadcast.
 
     This verifies the fix for the race condition where the broadcast
@@ -229,41 +495,23 @@ class TestSSHDsrDelivery(unittest.TestCase):
     PTY output (including DSR) to be lost.
     """
 
-    def setUp(self):
-        self.client = ssh_connect()
-        self.session_name = f"ssh-dsr-{int(time.time())}"
-        self.channel = None
-
-    def tearDown(self):
-        if self.channel and not self.channel.closed:
-            self.channel.close()
-        self.client.close()
+    session_prefix = "ssh-dsr"
 
     def test_dsr_arrives_without_manual_cpr(self):
         """DSR query (ESC[6n) should arrive at client via broadcast."""
-        channel = self.client.get_transport().open_session()
-        channel.get_pty(term="xterm-256color", width=80, height=24)
-        channel.exec_command(f"new {self.session_name}")
-        channel.settimeout(1.0)
+        channel = open_pty_channel(self.client, f"new {self.session_name}")
         self.channel = channel
 
         # CPR を送らずにデータを受信し、DSR が届くか確認
-        data = b""
-        start = time.time()
-        while time.time() - start < 5:
-            try:
-                chunk = channel.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                # DSR を検出したら即終了（成功）
-                if b"\x1b[6n" in data:
-                    break
-            except Exception:
-                pass
+        data = bytearray()
+        for chunk in iter_recv(channel, 5):
+            data += chunk
+            # DSR を検出したら即終了（成功）
+            if dsr_in_tail(data, len(chunk)):
+                break
 
         self.assertIn(
-            b"\x1b[6n",
+            DSR_QUERY,
             data,
             "DSR query not received — broadcast subscriber race condition?",
         )
@@ -273,31 +521,27 @@ class TestSSHSessionList(unittest.TestCase):
     """Test that created sessions appear in list."""
 
     def test_new_session_appears_in_list(self):
-        client = ssh_connect()
-        session_name = f"ssh-list-{int(time.time())}"
-
-        # Create session (non-interactive, will disconnect but session persists)
-        channel = client.get_transport().open_session()
-        channel.get_pty(term="xterm-256color", width=80, height=24)
-        channel.exec_command(f"new {session_name}")
-        time.sleep(2)
+        session_name = f"ssh-list-{secrets.token_hex(4)}"
+
+        # Create session on the already-connected PTY client; it persists
+        # after the channel closes
+        channel = open_pty_channel(shared_pty_client(), f"new {session_name}")
+        # Free the shared connection's channel even if the poll below raises
+        self.addCleanup(channel.close)
+        wait_for_listed(session_name)
         channel.close()
-        client.close()
 
-        # Check list
-        client2 = ssh_connect()
-        output = exec_simple(client2, "list")
+        # Check list on the already-connected non-PTY client
+        output = wait_for_listed(f"{session_name} (alive, 0 clients)")
         self.assertIn(session_name, output, f"Session {session_name} not in list")
         self.assertIn("alive", output)
-        client2.close()
 
 
 class TestSSHAuthRejection(unittest.TestCase):
     """Test that wrong password is rejected."""
 
     def test_wrong_password_rejected(self):
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client = new_client()
         with self.assertRaises(paramiko.AuthenticationException):
             client.connect(
                 SSH_HOST,
@@ -315,195 +559,139 @@ class TestSSHInvalidSession(unittest.TestCase):
     """Test that invalid session names are handled properly."""
 
     def test_invalid_session_name(self):
+        # Dedicated connection: the server rejects the exec by tearing down the
+        # whole connection, which must not take a shared client with it
         client = ssh_connect()
-        channel = client.get_transport().open_session()
-        channel.get_pty(term="xterm-256color", width=80, height=24)
-        channel.exec_command("new ../bad")
-        channel.settimeout(5.0)
-
-        output = b""
-        try:
-            while True:
-                data = channel.recv(4096)
-                if not data:
-                    break
-                output += data
-        except Exception:
-            pass
-
-        text = output.decode("utf-8", errors="replace")
+        self.addCleanup(client.close)
+        channel = open_pty_channel(client, "new ../bad")
+
+        output = bytearray()
+        for data in iter_recv(channel, 5):
+            output += data
+
         # Server should reject invalid name or report error
         has_error = (
-            "Invalid" in text
-            or "already exists" in text.lower()
+            b"Invalid" in output
+            or b"already exists" in output.lower()
             or channel.exit_status_ready()
         )
         self.assertTrue(
             has_error or channel.closed,
-            f"Expected error or channel close for invalid name, got: {text!r}",
+            f"Expected error or channel close for invalid name, got: {output!r}",
         )
-        channel.close()
-        client.close()
 
 
-class TestSSHWindowResize(unittest.TestCase):
+class TestSSHWindowResize(_PtySessionTest):
     """Test that window resize works during a session."""
 
-    def setUp(self):
-        self.client = ssh_connect()
-        self.session_name = f"ssh-resize-{int(time.time())}"
-        self.channel = None
-
-    def tearDown(self):
-        if self.channel and not self.channel.closed:
-            self.channel.close()
-        self.client.close()
+    session_prefix = "ssh-resize"
 
     def test_resize_then_echo(self):
         """After resize, echo should still work."""
         self.channel, output = exec_pty(
-            self.client, f"new {self.session_name}", duration=4
+            self.client, f"new {self.session_name}", duration=4, until=has_prompt
         )
-        text = output.decode("utf-8", errors="replace")
-
-        if ">" not in text and "PS " not in text and "$" not in text:
+        if not has_prompt(output):
             self.skipTest("Shell prompt did not appear")
 
         # Resize
         self.channel.resize_pty(width=120, height=40)
-        time.sleep(1)
 
-        # Send a command after resize
+        # Send a command after resize; read_until waits for the shell to catch up
         self.channel.send(b"echo RESIZE_OK\r\n")
-        time.sleep(2)
-
-        try:
-            extra = self.channel.recv(8192)
-            extra_text = extra.decode("utf-8", errors="replace")
-            self.assertIn("RESIZE_OK", extra_text)
-        except Exception as e:
-            self.fail(f"Failed to receive echo after resize: {e}")
+        extra = read_until(self.channel, b"RESIZE_OK")
+        self.assertIn(b"RESIZE_OK", extra, "echo output not received after resize")
 
 
-class TestSSHMultipleClients(unittest.TestCase):
+class TestSSHMultipleClients(_MultiClientTest):
     """Test that multiple clients can see the same session output."""
 
-    def setUp(self):
-        self.clients = []
-        self.channels = []
-        self.session_name = f"ssh-multi-{int(time.time())}"
-
-    def tearDown(self):
-        for ch in self.channels:
-            if not ch.closed:
-                ch.close()
-        for c in self.clients:
-            c.close()
-
     def test_two_clients_receive_output(self):
         """Both clients attached to the same session should receive echo output."""
         # Client 1: create session
-        client1 = ssh_connect()
-        self.clients.append(client1)
-        ch1, output1 = exec_pty(client1, f"new {self.session_name}", duration=4)
-        self.channels.append(ch1)
+        ch1, output1 = self.open_client(
+            f"new {self.session_name}", duration=4, until=has_prompt
+        )
 
-        text1 = output1.decode("utf-8", errors="replace")
-        if ">" not in text1 and "PS " not in text1 and "$" not in text1:
+        if not has_prompt(output1):
             self.skipTest("Shell prompt did not appear")
 
         # Client 2: attach to same session
-        client2 = ssh_connect()
-        self.clients.append(client2)
-        ch2, output2 = exec_pty(
-            client2, f"attach {self.session_name}", duration=4
+        ch2, output2 = self.open_client(
+            f"attach {self.session_name}",
+            compress=REPLAY_COMPRESS,
+            duration=4,
+            until=has_prompt,
         )
-        self.channels.append(ch2)
 
         # Send echo from client 1
         ch1.send(b"echo MULTI_CLIENT_TEST\r\n")
-        time.sleep(3)
 
         # Both clients should receive the output
-        try:
-            data2 = ch2.recv(8192)
-            text2 = data2.decode("utf-8", errors="replace")
-            self.assertIn(
-                "MULTI_CLIENT_TEST",
-                text2,
-                "Client 2 did not receive echo output",
-            )
-        except Exception as e:
-            self.fail(f"Client 2 failed to receive output: {e}")
+        data2 = read_until(ch2, b"MULTI_CLIENT_TEST")
+        self.assertIn(
+            b"MULTI_CLIENT_TEST",
+            data2,
+            "Client 2 did not receive echo output",
+        )
 
 
-class TestSSHReconnect(unittest.TestCase):
+class TestSSHReconnect(_MultiClientTest):
     """Test disconnect and reconnect with replay."""
 
-    def setUp(self):
-        self.session_name = f"ssh-reconn-{int(time.time())}"
+    session_prefix = "ssh-reconn"
 
     def test_reconnect_has_replay(self):
         """After disconnect+reconnect, replay should contain the marker."""
         # Session 1: create and send marker
-        client1 = ssh_connect()
-        ch1, output1 = exec_pty(client1, f"new {self.session_name}", duration=4)
-        text1 = output1.decode("utf-8", errors="replace")
-
-        if ">" not in text1 and "PS " not in text1 and "$" not in text1:
-            ch1.close()
-            client1.close()
+        ch1, output1 = self.open_client(
+            f"new {self.session_name}", duration=4, until=has_prompt
+        )
+        if not has_prompt(output1):
             self.skipTest("Shell prompt did not appear")
 
         ch1.send(b"echo RECONNECT_MARKER_42\r\n")
-        time.sleep(2)
+        read_until(ch1, b"RECONNECT_MARKER_42")
 
-        # Disconnect
+        # Disconnect for real before reattaching; tearDown's second close is a no-op
         ch1.close()
-        client1.close()
-        time.sleep(1)
+        self.clients[0].close()
+        wait_for_listed(f"{self.session_name} (alive, 0 clients)")
 
         # Reconnect and check replay
-        client2 = ssh_connect()
-        ch2, output2 = exec_pty(
-            client2, f"attach {self.session_name}", duration=4
+        _, output2 = self.open_client(
+            f"attach {self.session_name}",
+            compress=REPLAY_COMPRESS,
+            duration=4,
+            until=lambda out: b"RECONNECT_MARKER_42" in out,
         )
-        text2 = output2.decode("utf-8", errors="replace")
-
         self.assertIn(
-            "RECONNECT_MARKER_42",
-            text2,
-            f"Replay should contain marker, got: {text2!r}",
+            b"RECONNECT_MARKER_42",
+            output2,
+            f"Replay should contain marker, got: {output2!r}",
         )
 
-        ch2.close()
-        client2.close()
-
 
 class TestSSHNoPtyError(unittest.TestCase):
     """Test that PTY-requiring commands fail gracefully without PTY."""
 
     def test_attach_without_pty(self):
         """exec 'attach' without PTY should return error message."""
-        client = ssh_connect()
-        output = exec_simple(client, "attach default")
+        output = exec_simple(shared_client(), "attach default")
         self.assertIn(
             "PTY required",
             output,
             f"Expected 'PTY required' error, got: {output!r}",
         )
-        client.close()
 
     def test_new_without_pty(self):
         """exec 'new' without PTY should return error message."""
-        client = ssh_connect()
-        output = exec_simple(client, "new no-pty-session")
+        output = exec_simple(shared_client(), "new no-pty-session")
         self.assertIn(
             "PTY required",
             output,
             f"Expected 'PTY required' error, got: {output!r}",
         )
-        client.close()
 
 
 class TestSSHExecUnknown(unittest.TestCase):
@@ -511,49 +699,74 @@ class TestSSHExecUnknown(unittest.TestCase):
 
     def test_unknown_command_with_pty(self):
         """Unknown command with PTY should connect to default session."""
-        client = ssh_connect()
-        channel = client.get_transport().open_session()
-        channel.get_pty(term="xterm-256color", width=80, height=24)
-        channel.exec_command("some-unknown-command")
-        channel.settimeout(1.0)
-
-        all_output = b""
-        cpr_sent = False
-        start = time.time()
+        channel, output = exec_pty(
+            shared_pty_client(), "some-unknown-command", until=has_prompt
+        )
+        # Free the shared connection's channel slot even if an assert fails
+        self.addCleanup(channel.close)
 
-        while time.time() - start < 6:
-            try:
-                data = channel.recv(4096)
-                if not data:
-                    break
-                all_output += data
-                if b"\x1b[6n" in data and not cpr_sent:
-                    channel.send(b"\x1b[1;1R")
-                    cpr_sent = True
-            except Exception:
-                pass
-
-        text = all_output.decode("utf-8", errors="replace")
         # Should get a shell prompt (connected to default session)
-        has_prompt = ">" in text or "PS " in text or "$" in text
         self.assertTrue(
-            has_prompt,
-            f"Expected shell prompt for unknown command fallback, got: {text!r}",
+            has_prompt(output),
+            f"Expected shell prompt for unknown command fallback, got: {output!r}",
         )
 
-        channel.close()
-        client.close()
+
+def run_parallel(workers):
+    """Run each TestCase class on its own worker thread and report in order.
+
+    Every class creates its own SSH clients and uniquely named sessions, so
+    only the order of tests inside a class matters. Returns True on success.
+    """
+    loader = unittest.TestLoader()
+    suites = [
+        loader.loadTestsFromTestCase(obj)
+        for obj in list(globals().values())
+        if isinstance(obj, type)
+        and issubclass(obj, unittest.TestCase)
+        and not obj.__name__.startswith("_")
+    ]
+
+    def run_suite(suite):
+        stream = io.StringIO()
+        result = unittest.TextTestRunner(stream=stream, verbosity=2).run(suite)
+        return stream.getvalue(), result
+
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(run_suite, suites))
+    elapsed = time.monotonic() - start
+
+    run = failures = errors = skipped = 0
+    for output, result in outcomes:
+        sys.stderr.write(output)
+        run += result.testsRun
+        failures += len(result.failures)
+        errors += len(result.errors)
+        skipped += len(result.skipped)
+
+    ok = failures == 0 and errors == 0
+    sys.stderr.write("=" * 70 + "\n")
+    sys.stderr.write(
+        f"Total: ran {run} tests in {elapsed:.3f}s with {workers} workers "
+        f"({failures} failures, {errors} errors, {skipped} skipped) "
+        f"{'OK' if ok else 'FAILED'}\n"
+    )
+    return ok
 
 
 if __name__ == "__main__":
+    if "--fast" in sys.argv:
+        sys.argv.remove("--fast")
+        FAST_MODE = True
+
     # Check connectivity first
     print(f"Testing SSH server at {SSH_HOST}:{SSH_PORT}")
-    try:
-        client = ssh_connect()
-        client.close()
+    error = check_server()
+    if error is None:
         print("Connection OK\n")
-    except Exception as e:
-        print(f"Cannot connect to SSH server: {e}")
+    else:
+        print(f"Cannot connect to SSH server: {error}")
         print(
             f"\nMake sure the server is running with DEN_SSH_PORT={SSH_PORT}:"
         )
@@ -563,4 +776,8 @@ if __name__ == "__main__":
         )
         sys.exit(1)
 
-    unittest.main(verbosity=2)
+    if TEST_WORKERS <= 1 or len(sys.argv) > 1:
+        # Serial mode, or a specific test was selected on the command line
+        unittest.main(verbosity=2)
+    else:
+        sys.exit(0 if run_parallel(TEST_WORKERS) else 1)